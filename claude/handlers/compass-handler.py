@@ -4,27 +4,61 @@ COMPASS Handler - Simplified Agent Handoff System
 Tracks active agents via hook system and routes tool calls appropriately.
 """
 
+import os
 import sys
 import json
-import gc
+import time
+import atexit
 from datetime import datetime
 from pathlib import Path
 
 
+# Hook state and log locations, relative to the project directory
+LOGS_DIR = Path(".claude/logs")
+AGENT_STATE_FILE = LOGS_DIR / "agent-state.json"
+HANDLER_LOG_FILE = LOGS_DIR / "compass-handler.log"
+
 # Global state: currently active agent
 current_active_agent = None
 
+# COMPASS workflow phase for each agent, built once at import
+AGENT_WORKFLOW_PHASES = {
+    "compass-complexity-analyzer": "step_1_complexity_assessment",
+    "compass-knowledge-discovery": "step_2_knowledge_discovery",
+    "compass-strategy-builder": "step_3_strategic_planning",
+    "compass-pattern-apply": "step_4_execution",
+    "compass-doc-planning": "step_4_execution",
+    "compass-gap-analysis": "step_4_execution",
+    "compass-enhanced-analysis": "step_4_execution",
+    "compass-coder": "step_4_execution",
+    "compass-cross-reference": "step_4_execution",
+    "compass-memory-integrator": "step_4_execution",
+    "compass-validation-coordinator": "step_4_execution",
+}
+
+# Handler log lines buffered during this hook invocation
+pending_log_lines = []
+
+# Set once .claude/logs has been created by this process
+logs_dir_ready = False
+
+
+def ensure_logs_dir():
+    """Create the logs directory at most once per process"""
+    global logs_dir_ready
+    if not logs_dir_ready:
+        LOGS_DIR.mkdir(parents=True, exist_ok=True)
+        logs_dir_ready = True
+
 
 def load_agent_state():
     """Load the currently active agent from persistent storage"""
     try:
-        logs_dir = Path(".claude/logs")
-        state_file = logs_dir / "agent-state.json"
-
-        if state_file.exists():
-            with open(state_file, "r") as f:
-                data = json.load(f)
-                return data.get("active_agent", None)
+        with open(AGENT_STATE_FILE, "r") as f:
+            data = json.load(f)
+            return data.get("active_agent", None)
+    except FileNotFoundError:
+        # No agent has been started yet
         return None
     except Exception:
         return None
@@ -33,50 +67,30 @@ def load_agent_state():
 def save_agent_state(agent_name):
     """Save the currently active agent to persistent storage"""
     try:
-        logs_dir = Path(".claude/logs")
-        logs_dir.mkdir(parents=True, exist_ok=True)
+        ensure_logs_dir()
 
-        state_file = logs_dir / "agent-state.json"
         state_data = {
             "active_agent": agent_name,
             "last_updated": datetime.now().isoformat(),
             "workflow_phase": get_workflow_phase(agent_name),
         }
 
-        with open(state_file, "w") as f:
-            json.dump(state_data, f, indent=2)
+        with open(AGENT_STATE_FILE, "w") as f:
+            json.dump(state_data, f, separators=(",", ":"))
     except Exception:
         pass  # Fail silently
 
 
 def get_workflow_phase(agent_name):
     """Determine COMPASS workflow phase based on active agent"""
-    if agent_name == "compass-complexity-analyzer":
-        return "step_1_complexity_assessment"
-    elif agent_name == "compass-knowledge-discovery":
-        return "step_2_knowledge_discovery"
-    elif agent_name == "compass-strategy-builder":
-        return "step_3_strategic_planning"
-    elif agent_name in [
-        "compass-pattern-apply",
-        "compass-doc-planning",
-        "compass-gap-analysis",
-        "compass-enhanced-analysis",
-        "compass-coder",
-        "compass-cross-reference",
-        "compass-memory-integrator",
-        "compass-validation-coordinator",
-    ]:
-        return "step_4_execution"
-    else:
-        return "unknown"
+    return AGENT_WORKFLOW_PHASES.get(agent_name, "unknown")
 
 
 def main():
     """Main entry point for Claude Code hook system"""
     try:
-        # Memory optimization
-        gc.collect()
+        # Write buffered log lines once, on every exit path
+        atexit.register(flush_activity_log)
 
         # Read input from stdin
         if sys.stdin.isatty():
@@ -113,9 +127,6 @@ def main():
             else:
                 sys.exit(0)
 
-        # Memory optimization
-        gc.collect()
-
     except json.JSONDecodeError as e:
         print(f"COMPASS Handler Error: Invalid JSON input: {e}", file=sys.stderr)
         sys.exit(1)
@@ -243,17 +254,43 @@ def create_allow_response():
 
 
 def log_activity(message):
-    """Log handler activity for debugging"""
-    try:
-        logs_dir = Path(".claude/logs")
-        logs_dir.mkdir(parents=True, exist_ok=True)
+    """Log handler activity for debugging (buffered until flush_activity_log)"""
+    pending_log_lines.append((time.time_ns(), message))
+
 
-        with open(logs_dir / "compass-handler.log", "a") as f:
-            timestamp = datetime.now().isoformat()
-            f.write(f"{timestamp}: {message}\n")
+def format_log_timestamp(timestamp_ns):
+    """Render an epoch-nanosecond timestamp as local ISO-8601 time"""
+    seconds, nanos = divmod(timestamp_ns, 1_000_000_000)
+    return (
+        datetime.fromtimestamp(seconds).replace(microsecond=nanos // 1000).isoformat()
+    )
+
+
+def flush_activity_log():
+    """Append buffered handler log lines with a single os.write"""
+    if not pending_log_lines:
+        return
+    try:
+        ensure_logs_dir()
+        log_text = "".join(
+            f"{format_log_timestamp(timestamp_ns)}: {message}\n"
+            for timestamp_ns, message in pending_log_lines
+        )
+
+        # O_APPEND keeps concurrent hook processes from interleaving lines
+        fd = os.open(
+            HANDLER_LOG_FILE,
+            os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+            0o644,
+        )
+        try:
+            os.write(fd, log_text.encode("utf-8"))
+        finally:
+            os.close(fd)
     except Exception:
         # Fail silently if logging fails
         pass
+    pending_log_lines.clear()
 
 
 if __name__ == "__main__":